@@ -1,31 +1,79 @@
+import asyncio
+import hashlib
 import logging
 import os
+import time
+from types import MappingProxyType
 from urllib.parse import urlparse
 
 from aiohttp import ClientConnectorError, ClientResponse, ClientSession, ClientTimeout, InvalidURL, TCPConnector, web
+from multidict import CIMultiDict, CIMultiDictProxy
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(levelname)s: %(message)s",  # Removes timestamps and logger names
-)
-logger = logging.getLogger(__name__)
+logger = logging.getLogger("noob_proxy")
 # Headers that should not be forwarded (Hop-by-hop)
-HOP_BY_HOP = {
-    "connection", "keep-alive", "proxy-authenticate",
-    "proxy-authorization", "te", "trailers",
-    "transfer-encoding", "upgrade", "content-length",
-}
+HOP_BY_HOP = frozenset({
+    "connection", "keep-alive", "proxy-connection", "proxy-authenticate",
+    "proxy-authorization", "te", "trailer",
+    "transfer-encoding", "upgrade",
+})
+# Request headers dropped on top of HOP_BY_HOP before forwarding.
+# Content-Length is kept so streamed bodies of known size are not re-sent chunked.
+REQUEST_DROP = HOP_BY_HOP | {"host"}
 PORT = int(os.getenv("PORT", 8007))
+# Upstream timeout strategy, set once as the session default:
+# total=None: Allow streams to run for hours if needed.
+# connect=10: Kill if we can't connect to target within 10s.
+# sock_read=60: Kill if the server stops sending data for 60s.
+UPSTREAM_TIMEOUT = ClientTimeout(total=None, connect=10, sock_read=60)
+# CORS preflight answer is identical for every target; aiohttp copies it into each response
+PREFLIGHT_HEADERS = MappingProxyType({
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "*",
+    "Access-Control-Allow-Headers": "*",
+    "Access-Control-Max-Age": "86400",
+})
+# Single upstream session shared by all handlers for the app's lifetime
+CLIENT_SESSION = web.AppKey("client_session", ClientSession)
+# Model lists change on the order of hours, so cache GET .../models bodies briefly.
+# Entries are keyed per target URL + forwarded request headers (see models_cache_key): (expires_at, headers, body)
+# MODELS_TTL is an upper bound; upstream Cache-Control can only shorten it (see models_ttl).
+MODELS_TTL = 60
+MODELS_CACHE_SIZE = 64
+# Only bodies with a declared Content-Length up to this size are buffered and cached
+MODELS_MAX_BODY = 1024 * 1024
+ModelsEntry = tuple[float, CIMultiDict[str], bytes]
+MODELS_CACHE = web.AppKey("models_cache", dict[str, ModelsEntry])
+# In-flight fetches per key, so concurrent misses share one upstream request
+MODELS_INFLIGHT = web.AppKey("models_inflight", dict[str, "asyncio.Future[ModelsEntry | None]"])
+# Request headers that never change the upstream answer, left out of the cache key
+CACHE_KEY_IGNORE = frozenset({"user-agent", "accept-language", "referer", "origin", "dnt"})
 
 
-async def process_response(response: ClientResponse, request: web.Request) -> web.StreamResponse:
-    proxy_resp = web.StreamResponse(status=response.status, reason=response.reason)
-    # Copy relevant headers from target, then add CORS
-    for k, v in response.headers.items():
-        if k.lower() not in HOP_BY_HOP:
-            proxy_resp.headers[k] = v
+def strip_headers(headers: CIMultiDictProxy[str], names: frozenset[str]) -> CIMultiDict[str]:
+    # Copy keeps repeated headers (e.g. Set-Cookie); popall is a case-insensitive O(1) lookup
+    out = headers.copy()
+    for name in names:
+        out.popall(name, None)
+    return out
+
+
+def add_cors(request: web.Request, response: web.StreamResponse) -> None:
+    # Non-browser clients send no Origin, so skip the CORS header for them.
+    # Vary: Origin is added unless upstream already varies on Origin/*,
+    # so shared caches keep the two variants apart.
+    vary = {v.strip().lower() for value in response.headers.getall("Vary", ()) for v in value.split(",")}
+    if not vary & {"origin", "*"}:
+        response.headers.add("Vary", "Origin")
+    if "Origin" in request.headers:
+        response.headers["Access-Control-Allow-Origin"] = "*"
 
-    proxy_resp.headers["Access-Control-Allow-Origin"] = "*"
+
+async def process_response(response: ClientResponse, request: web.Request) -> web.StreamResponse:
+    # Copy relevant headers from target (keeping repeated ones like Set-Cookie), then add CORS if needed.
+    # Content-Length is kept so fixed-size bodies are relayed without chunked framing.
+    headers = strip_headers(response.headers, HOP_BY_HOP)
+    proxy_resp = web.StreamResponse(status=response.status, reason=response.reason, headers=headers)
+    add_cors(request, proxy_resp)
     await proxy_resp.prepare(request)
 
     # 5. Defensive Streaming (The "Closed Transport" Fix)
@@ -43,6 +91,91 @@ async def process_response(response: ClientResponse, request: web.Request) -> we
     return proxy_resp
 
 
+def models_cache_key(target_url: str, headers: CIMultiDict[str]) -> str:
+    # Credentials can live in any header (Authorization, x-api-key, Cookie, ...) and the body is
+    # relayed still encoded, so every forwarded header except a few harmless ones is part of the key.
+    h = hashlib.blake2b(target_url.encode(), digest_size=16)
+    for name, value in sorted((k.lower(), v) for k, v in headers.items() if k.lower() not in CACHE_KEY_IGNORE):
+        h.update(b"\0" + name.encode() + b":" + value.encode("utf-8", "surrogateescape"))
+    return h.hexdigest()
+
+
+def models_ttl(cache_control: str) -> float:
+    # no-store/private/no-cache opt out entirely; max-age/s-maxage cap the TTL (0 means uncacheable)
+    ttl = MODELS_TTL
+    for directive in cache_control.split(","):
+        name, _, value = directive.strip().partition("=")
+        name = name.lower()
+        if name in ("no-store", "private", "no-cache"):
+            return 0
+        if name in ("max-age", "s-maxage"):
+            try:
+                ttl = min(ttl, int(value.strip('" ')))
+            except ValueError:
+                return 0
+    return ttl
+
+
+def models_reply(request: web.Request, entry: ModelsEntry) -> web.Response:
+    proxy_resp = web.Response(status=200, headers=entry[1], body=entry[2])
+    add_cors(request, proxy_resp)
+    return proxy_resp
+
+
+async def cached_models(
+    request: web.Request, session: ClientSession, target_url: str, headers: CIMultiDict[str],
+) -> web.StreamResponse | None:
+    # Returns None when the caller should fetch target_url itself (uncacheable answer)
+    key = models_cache_key(target_url, headers)
+    cache = request.app[MODELS_CACHE]
+    entry = cache.get(key)
+    if entry is not None and time.monotonic() < entry[0]:
+        logger.info("<-- 200 %s (cached)", target_url)
+        return models_reply(request, entry)
+
+    inflight = request.app[MODELS_INFLIGHT]
+    pending = inflight.get(key)
+    if pending is not None:
+        # Someone is already fetching this key: share their result instead of a second upstream call.
+        # shield() keeps our cancellation (client gone) from cancelling the shared future.
+        entry = await asyncio.shield(pending)
+        return None if entry is None else models_reply(request, entry)
+
+    pending = inflight[key] = asyncio.get_running_loop().create_future()
+
+    def release(result: ModelsEntry | None) -> None:
+        # Waiters get None on errors/uncacheable answers and fall back to their own request
+        if inflight.get(key) is pending:
+            del inflight[key]
+        if not pending.done():
+            pending.set_result(result)
+
+    entry = None
+    try:
+        async with session.get(target_url, headers=headers) as target_resp:
+            logger.info("<-- %s %s", target_resp.status, target_url)
+            ttl = models_ttl(", ".join(target_resp.headers.getall("Cache-Control", ())))
+            length = target_resp.content_length
+            if (
+                target_resp.status != 200 or ttl <= 0
+                or length is None or length > MODELS_MAX_BODY
+                # Cached bodies are shared between callers, so per-caller cookies mean no caching
+                or "Set-Cookie" in target_resp.headers
+            ):
+                # Free the waiters now rather than after this body has been streamed
+                release(None)
+                return await process_response(target_resp, request)
+            body = await target_resp.read()
+            entry = (time.monotonic() + ttl, strip_headers(target_resp.headers, HOP_BY_HOP), body)
+        cache.pop(key, None)
+        if len(cache) >= MODELS_CACHE_SIZE:
+            del cache[next(iter(cache))]  # Evict the oldest entry
+        cache[key] = entry
+    finally:
+        release(entry)
+    return models_reply(request, entry)
+
+
 async def proxy_handler(request: web.Request):
     # 1. Extract the target URL from the path
     # Usage: http://localhost:8080/https://api.example.com/data
@@ -52,7 +185,7 @@ async def proxy_handler(request: web.Request):
         return web.Response(text="CORS Proxy Active", status=200)
 
     parsed = urlparse(target_url)
-    if not all([parsed.scheme, parsed.netloc]):
+    if not (parsed.scheme and parsed.netloc):
         return web.Response(
             text=f"Invalid URL: '{target_url}'. Ensure it includes the scheme (e.g., https://).",
             status=400,
@@ -65,26 +198,23 @@ async def proxy_handler(request: web.Request):
     # 2. Handle CORS Preflight (OPTIONS)
     # We intercept this to tell the browser "Yes, we allow everything."
     if request.method == "OPTIONS":
-        return web.Response(status=200, headers={
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "*",
-            "Access-Control-Allow-Headers": "*",
-            "Access-Control-Max-Age": "86400",
-        })
+        return web.Response(status=200, headers=PREFLIGHT_HEADERS)
     # Simple "Request Received" log
     logger.info("--> %s %s", request.method, target_url)
 
     # 3. Prepare headers to forward
     # We strip 'Host' because the target server expects its own host header
-    headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP and k.lower() != "host"}
+    headers = strip_headers(request.headers, REQUEST_DROP)
 
     try:
-        session: ClientSession = request.app["client_session"]
-        # 4. Timeout Strategy
-        # total=None: Allow streams to run for hours if needed.
-        # connect=10: Kill if we can't connect to target within 10s.
-        # sock_read=60: Kill if the server stops sending data for 60s.
-        timeout = ClientTimeout(total=None, connect=10, sock_read=60)
+        session = request.app[CLIENT_SESSION]
+        # Any host whose path ends in /models goes through the cache, not only model-list APIs;
+        # cached_models streams anything it won't cache (non-200, Cache-Control opt-out, unknown or large size).
+        # GETs carrying a body take the normal path so the body (and its Content-Length) is forwarded.
+        if request.method == "GET" and not request.can_read_body and parsed.path.endswith("/models"):
+            cached = await cached_models(request, session, target_url, headers)
+            if cached is not None:
+                return cached
 
         async with session.request(
             method=request.method,
@@ -92,7 +222,6 @@ async def proxy_handler(request: web.Request):
             headers=headers,
             data=request.content if request.can_read_body else None,
             allow_redirects=True,
-            timeout=timeout,
         ) as target_resp:
             # Simple "Response Sent" log
             logger.info("<-- %s %s", target_resp.status, target_url)
@@ -109,17 +238,31 @@ async def proxy_handler(request: web.Request):
 
 async def on_startup(app):
     # Reuse a single session for all outgoing requests
-    connector = TCPConnector(limit=0)
-    app["client_session"] = ClientSession(connector=connector, auto_decompress=False)
+    # limit=0: no cap on concurrent upstream streams (long-lived SSE would exhaust a small pool).
+    # keepalive_timeout=75: keep idle TLS connections well past aiohttp's 15s default to avoid re-handshakes.
+    # ttl_dns_cache=300: resolve each target host at most every 5 minutes.
+    connector = TCPConnector(limit=0, keepalive_timeout=75, ttl_dns_cache=300)
+    app[CLIENT_SESSION] = ClientSession(connector=connector, timeout=UPSTREAM_TIMEOUT, auto_decompress=False)
+    app[MODELS_CACHE] = {}
+    app[MODELS_INFLIGHT] = {}
     logger.info("ClientSession created")
 
 
 async def on_cleanup(app):
-    await app["client_session"].close()
+    await app[CLIENT_SESSION].close()
     logger.info("ClientSession closed")
 
 
 def main():
+    log_level = os.getenv("LOG_LEVEL", "INFO").upper()
+    # getLevelName maps known names to their int level; anything else is a typo
+    level = logging.getLevelName(log_level)
+    logging.basicConfig(
+        level=level if isinstance(level, int) else logging.INFO,
+        format="%(levelname)s: %(message)s",  # Removes timestamps and logger names
+    )
+    if not isinstance(level, int):
+        logger.warning("Unknown LOG_LEVEL %r, falling back to INFO", log_level)
     app = web.Application(client_max_size=1024**3 * 5)  # 5GB, pls don't abuse...
     # Capture everything after the first slash as the URL
     app.router.add_route("*", "/{url:.*}", proxy_handler)
@@ -127,7 +270,14 @@ def main():
     app.on_startup.append(on_startup)
     app.on_cleanup.append(on_cleanup)
 
-    web.run_app(app, port=PORT, access_log=None)
+    try:
+        # libuv-backed loop: faster scheduling and socket I/O for a pure relay workload
+        import uvloop
+        loop = uvloop.new_event_loop()
+    except ImportError:
+        loop = None  # Fall back to the default asyncio loop (e.g. on Windows)
+
+    web.run_app(app, port=PORT, access_log=None, loop=loop)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,35 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+
+import noob_proxy
+
+
+def test_allow_origin_only_for_requests_with_origin():
+    async def main():
+        response = web.Response()
+        noob_proxy.add_cors(make_mocked_request("GET", "/"), response)
+        assert "Access-Control-Allow-Origin" not in response.headers
+        assert response.headers.getall("Vary") == ["Origin"]
+
+        response = web.Response()
+        noob_proxy.add_cors(make_mocked_request("GET", "/", headers={"Origin": "http://x"}), response)
+        assert response.headers["Access-Control-Allow-Origin"] == "*"
+        assert response.headers.getall("Vary") == ["Origin"]
+
+    asyncio.run(main())
+
+
+def test_vary_origin_is_not_duplicated():
+    async def main():
+        request = make_mocked_request("GET", "/", headers={"Origin": "http://x"})
+        response = web.Response(headers={"Vary": "Accept-Encoding, origin"})
+        noob_proxy.add_cors(request, response)
+        assert response.headers.getall("Vary") == ["Accept-Encoding, origin"]
+
+        response = web.Response(headers={"Vary": "Accept-Encoding"})
+        noob_proxy.add_cors(request, response)
+        assert response.headers.getall("Vary") == ["Accept-Encoding", "Origin"]
+
+    asyncio.run(main())
@@ -0,0 +1,166 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import ClientSession, ClientTimeout, web
+from aiohttp.test_utils import TestServer
+
+import noob_proxy
+
+
+def run_against_upstream(scenario, *, headers=None, size=100):
+    """Start a fake upstream and the proxy, then run ``scenario(get, calls)``.
+
+    ``get(path, data=None, **headers)`` fetches ``path`` on the upstream through the proxy and
+    returns ``(status, body)``; ``calls["n"]`` counts requests that reached the upstream
+    and ``calls["headers"]`` holds the headers of the last proxied response.
+    """
+    calls = {"n": 0}
+
+    async def models(request: web.Request) -> web.StreamResponse:
+        calls["n"] += 1
+        sent = await request.read()
+        if request.headers.get("x-api-key", "secret") != "secret":
+            return web.Response(status=401, text="bad key")
+        return web.Response(body=b"%d" % calls["n"] + sent + b"x" * size, headers=headers or {})
+
+    async def chunked(request: web.Request) -> web.StreamResponse:
+        calls["n"] += 1
+        n = calls["n"]
+        resp = web.StreamResponse()
+        await resp.prepare(request)
+        if request.path.startswith("/slow"):
+            await asyncio.sleep(0.5)
+        await resp.write(b"%d" % n)
+        await resp.write_eof()
+        return resp
+
+    async def main():
+        upstream = web.Application()
+        upstream.router.add_get("/v1/models", models)
+        upstream.router.add_get("/chunked/models", chunked)
+        upstream.router.add_get("/slow/chunked/models", chunked)
+        app = web.Application()
+        app.router.add_route("*", "/{url:.*}", noob_proxy.proxy_handler)
+        app.on_startup.append(noob_proxy.on_startup)
+        app.on_cleanup.append(noob_proxy.on_cleanup)
+
+        async with TestServer(upstream) as up, TestServer(app) as proxy, \
+                ClientSession(timeout=ClientTimeout(total=5)) as session:
+            base = f"http://127.0.0.1:{proxy.port}/http://127.0.0.1:{up.port}"
+
+            async def get(path, data=None, **req_headers):
+                async with session.get(base + path, data=data, headers=req_headers) as resp:
+                    calls["headers"] = resp.headers
+                    return resp.status, await resp.read()
+
+            await scenario(get, calls)
+
+    asyncio.run(main())
+
+
+def test_second_request_is_served_from_cache():
+    async def scenario(get, calls):
+        first = await get("/v1/models")
+        assert await get("/v1/models") == first
+        assert first[0] == 200
+        assert calls["n"] == 1
+
+    run_against_upstream(scenario)
+
+
+def test_expired_entry_is_refetched(monkeypatch):
+    monkeypatch.setattr(noob_proxy, "MODELS_TTL", 0)
+
+    async def scenario(get, calls):
+        first = await get("/v1/models")
+        second = await get("/v1/models")
+        assert first != second
+        assert calls["n"] == 2
+
+    run_against_upstream(scenario)
+
+
+def test_credentials_in_any_header_are_part_of_the_key():
+    async def scenario(get, calls):
+        assert (await get("/v1/models", **{"x-api-key": "secret"}))[0] == 200
+        assert await get("/v1/models", **{"x-api-key": "WRONG"}) == (401, b"bad key")
+        assert calls["n"] == 2
+
+    run_against_upstream(scenario)
+
+
+def test_concurrent_misses_share_one_upstream_request():
+    async def scenario(get, calls):
+        results = await asyncio.gather(*(get("/v1/models") for _ in range(5)))
+        assert len(set(results)) == 1
+        assert calls["n"] == 1
+
+    run_against_upstream(scenario)
+
+
+@pytest.mark.parametrize("cache_control", [
+    "private, max-age=60", "no-store", "no-cache", "max-age=0", "public, s-maxage=0",
+])
+def test_cache_control_opt_out_is_not_cached(cache_control):
+    async def scenario(get, calls):
+        await get("/v1/models")
+        await get("/v1/models")
+        assert calls["n"] == 2
+
+    run_against_upstream(scenario, headers={"Cache-Control": cache_control})
+
+
+@pytest.mark.parametrize(("cache_control", "ttl"), [
+    ("", noob_proxy.MODELS_TTL),
+    ("public, max-age=600", noob_proxy.MODELS_TTL),
+    ("max-age=5", 5),
+    ("max-age=30, s-maxage=10", 10),
+    ('max-age="bogus"', 0),
+])
+def test_cache_control_caps_ttl(cache_control, ttl):
+    assert noob_proxy.models_ttl(cache_control) == ttl
+
+
+def test_unknown_or_large_bodies_are_not_cached(monkeypatch):
+    monkeypatch.setattr(noob_proxy, "MODELS_MAX_BODY", 50)
+
+    async def scenario(get, calls):
+        assert (await get("/chunked/models")) == (200, b"1")
+        assert (await get("/chunked/models")) == (200, b"2")
+        await get("/v1/models")
+        await get("/v1/models")
+        assert calls["n"] == 4
+
+    run_against_upstream(scenario)
+
+
+def test_get_with_body_is_forwarded_and_not_cached():
+    async def scenario(get, calls):
+        assert await get("/v1/models", data=b"hello") == (200, b"1hello" + b"x" * 100)
+        assert await get("/v1/models", data=b"hello") == (200, b"2hello" + b"x" * 100)
+        assert calls["n"] == 2
+
+    run_against_upstream(scenario)
+
+
+def test_set_cookie_is_relayed_and_not_cached():
+    async def scenario(get, calls):
+        await get("/v1/models")
+        assert calls["headers"]["Set-Cookie"] == "sid=1"
+        await get("/v1/models")
+        assert calls["headers"]["Set-Cookie"] == "sid=1"
+        assert calls["n"] == 2
+
+    run_against_upstream(scenario, headers={"Set-Cookie": "sid=1"})
+
+
+def test_waiters_are_not_held_behind_an_uncacheable_stream():
+    async def scenario(get, calls):
+        start = time.monotonic()
+        results = await asyncio.gather(*(get("/slow/chunked/models") for _ in range(3)))
+        # Each waiter fetches on its own in parallel instead of after the first stream ends
+        assert time.monotonic() - start < 0.8
+        assert sorted(results) == [(200, b"1"), (200, b"2"), (200, b"3")]
+
+    run_against_upstream(scenario)